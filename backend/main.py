@@ -1,17 +1,25 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import whisper
+from faster_whisper import WhisperModel
+import ctranslate2
 import os
+import asyncio
+import hashlib
+import logging
 import tempfile
 import magic
-from langchain_community.llms import Ollama
+import numpy as np
+from cachetools import TTLCache
+from langchain_ollama import OllamaLLM
 from langchain.chains.summarize import load_summarize_chain
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from transformers import pipeline
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.output_parsers import StrOutputParser
 import re
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -21,20 +29,105 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-whisper_model = whisper.load_model("small")
-# llm = Ollama(model="tinyllama")
-llm = Ollama(model='deepseek-r1:1.5b')
-# llm = Ollama(model="qwen3:1.7b")
+# FP16 on a GPU, INT8 on the CPU.
+whisper_device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+whisper_compute_type = "float16" if whisper_device == "cuda" else "int8"
+# Each concurrent transcription gets its share of the cores.
+WHISPER_NUM_WORKERS = 2
+whisper_model = WhisperModel(
+    "distil-small.en",
+    device=whisper_device,
+    compute_type=whisper_compute_type,
+    cpu_threads=max(1, (os.cpu_count() or 1) // WHISPER_NUM_WORKERS),
+    num_workers=WHISPER_NUM_WORKERS,
+)
+# Context window used by the backend only; it is sent to ollama as num_ctx with every request.
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", 8192))
+# Parallel request slots of the ollama server; keep this in line with `ollama serve`.
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+# Half of the context is kept for the generation: deepseek-r1 writes its <think> block into
+# the same context before the report.  num_predict stops a runaway generation at that budget.
+REPORT_OUTPUT_TOKENS = OLLAMA_NUM_CTX // 2
+# Seconds to wait for one ollama response; calls queued behind the parallel slots and long
+# reasoning passes on CPU can take several minutes.
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", 600))
+
+# llm = OllamaLLM(model="tinyllama")
+# keep_alive=-1 keeps the model loaded in ollama between requests.
+# OllamaLLM holds one sync and one async HTTP client, so every call reuses the same connections.
+llm = OllamaLLM(
+    model='deepseek-r1:1.5b',
+    keep_alive=-1,
+    num_ctx=OLLAMA_NUM_CTX,
+    num_predict=REPORT_OUTPUT_TOKENS,
+    client_kwargs={"timeout": OLLAMA_TIMEOUT},
+)
+# llm = OllamaLLM(model="qwen3:1.7b")
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+MIME_HEADER_SIZE = 2048
+
+# Results keyed by the SHA-256 of the uploaded file / transcript, so repeated submissions skip the models.
+transcript_cache = TTLCache(maxsize=128, ttl=3600)
+report_cache = TTLCache(maxsize=128, ttl=3600)
 
 class TranscriptRequest(BaseModel):
     transcript: str
 
+@app.on_event("startup")
+async def warm_up_models():
+    """
+    Runs one small transcription and one prompt at startup so the first real request
+    does not pay for kernel initialisation and for ollama loading the model.
+    """
+    def warm_up_whisper():
+        silence = np.zeros(16000, dtype=np.float32)
+        # The VAD finds no speech in silence, so this only loads Silero VAD; the plain
+        # call below runs the encoder and decoder.
+        transcribe_file(silence)
+        segments, info = whisper_model.transcribe(silence, beam_size=1)
+        list(segments)
+
+    # One generated token is enough for ollama to load the model.
+    warm_up_llm = llm.model_copy(update={"num_predict": 1})
+
+    # A failed warm up only costs the first request its latency, so it does not stop startup.
+    results = await asyncio.gather(
+        asyncio.to_thread(warm_up_whisper),
+        warm_up_llm.ainvoke("hi"),
+        return_exceptions=True,
+    )
+    for name, result in zip(["whisper", "ollama"], results):
+        if isinstance(result, Exception):
+            logger.warning("Warm up of %s failed: %s", name, result)
+
+def transcribe_file(path) -> str:
+    """
+    Transcribes an audio or video file with faster-whisper.  The segments are decoded
+    lazily, so this should run off the event loop.
+
+    Args:
+        path: The path of the file to transcribe, or a 16 kHz float32 waveform.
+
+    Returns:
+        The transcript of the audio.
+    """
+    # Silero VAD drops silent regions before they reach the model.
+    segments, info = whisper_model.transcribe(
+        path,
+        vad_filter=True,
+        vad_parameters={"min_silence_duration_ms": 500},
+        beam_size=1,
+        condition_on_previous_text=False,
+    )
+    return "".join(segment.text for segment in segments)
+
 @app.post("/upload_audio_video/")
 async def upload_audio_video(file: UploadFile = File(...)):
     """
-    Handles uploading and processing of audio and video files.  It saves the uploaded
-    file to a temporary location, checks the file type, and then uses whisper to
-    transcribe the audio.  The temporary file is then deleted.
+    Handles uploading and processing of audio and video files.  It checks the file
+    type from the first bytes of the upload, saves the file to a temporary location,
+    and then uses faster-whisper to transcribe the audio.  The temporary file is then deleted.
 
     Args:
         file (UploadFile): The file to upload.
@@ -46,56 +139,66 @@ async def upload_audio_video(file: UploadFile = File(...)):
         HTTPException: If the file type is not supported or if there is an error
                        during processing.
     """
+    # Determine the file type from the first bytes using libmagic, before anything is written to disk.
+    header = await file.read(MIME_HEADER_SIZE)
+    mime_type = magic.from_buffer(header, mime=True)
+
+    # Check if the file is an audio or video file that whisper can process
+    if not mime_type.startswith("audio/") and not mime_type.startswith("video/"):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type.  Must be audio or video.  Got {mime_type}",
+        )
+
+    tmp_path = None
     try:
-        # Create a temporary file.
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            file_content = await file.read()
-            tmp.write(file_content)
-            tmp_path = tmp.name 
-
-        # Determine the file type using libmagic.
-        mime_type = magic.from_file(tmp_path, mime=True)
-
-        # Check if the file is an audio or video file that whisper can process
-        if not mime_type.startswith("audio/") and not mime_type.startswith("video/"):
-            os.remove(tmp_path)
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type.  Must be audio or video.  Got {mime_type}",
-            )
-
-        result = whisper_model.transcribe(tmp_path)
-
-        os.remove(tmp_path)
-        return {"transcript": result["text"]}
+        # Create a temporary file and stream the upload into it in 1 MB chunks.
+        with tempfile.NamedTemporaryFile(delete=False, buffering=UPLOAD_CHUNK_SIZE) as tmp:
+            tmp_path = tmp.name
+            tmp.write(header)
+            file_hash = hashlib.sha256(header)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                tmp.write(chunk)
+                file_hash.update(chunk)
+
+        file_key = file_hash.hexdigest()
+        if file_key in transcript_cache:
+            text = transcript_cache[file_key]
+        else:
+            text = await asyncio.to_thread(transcribe_file, tmp_path)
+            transcript_cache[file_key] = text
+
+        return {"transcript": text}
     except Exception as e:
-        os.remove(tmp_path)
         raise HTTPException(
             status_code=500, detail=f"Error processing file: {e}"
         )
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
 
-summary_prompt_template = """
-You are a helpful assistent that can help make a summary of the text.
-Please generate a concise summary of the from the transcript below. Focus on the main discussion points, decisions made, and important highlights.
+report_prompt_template = """
+You are a helpful assistent that takes notes of meetings.
+Read the transcript below and write every section listed under ===Sections.
+Start each section with its header line exactly as given (for example "=== SUMMARY ===") and do not add any other headers.
 
 ===Transcript:
 {text}
 
-===Response guideline:
+===Sections:
+"""
+
+summary_section_template = """
+=== SUMMARY ===
+Generate a concise summary of the transcript. Focus on the main discussion points, decisions made, and important highlights.
 - You should write summary based only on the provided information.
 - Keep the summary factual and to the point.
 - Avoid adding interpretations or assumptions.
-- Donot give the heading summary.
 """
 
-keypoints_prompt_template = """
-You are a helpful assistent that can help take note of key points of the provided text.
-Please extract and list the key discussion points from the transcript below.
-
-===Transcript:
-{text}
-
-===Response guideline:
+keypoints_section_template = """
+=== KEYPOINTS ===
+Extract and list the key discussion points from the transcript.
 - You should give keypoints based only on the provided information.
 - Present the output as bullet points.
 - Focus only on the core discussion points; do not include filler or small talk.
@@ -103,12 +206,24 @@ Please extract and list the key discussion points from the transcript below.
 - Donot give more than 10 points.
 """
 
-action_items_prompt_template = """
-From the following transcript, extract all action items discussed or agreed upon. Each item should be specific, actionable, and ideally include who is responsible (if known).
-
-Transcript:
-{text}
+problem_solution_tech_section_template = """
+=== PROBLEMS ===
+Extract all
+1. Problem statements mentioned in the discussion. List them clearly and concisely.
+2. Propose Solutions for each problem statement.
+3. Recommended technology stack for each solution.
+Answer format:
+1. Problem: ...
+   Solution: ...
+   Technology Stack Recommendation: ...
+2. Problem: ...
+   Solution: ...
+   Technology Stack Recommendation: ...
+"""
 
+action_items_section_template = """
+=== ACTION_ITEMS ===
+Extract all action items discussed or agreed upon. Each item should be specific, actionable, and ideally include who is responsible (if known).
 Answer format:
 1. Task: ...
    Assigned to: ...
@@ -118,37 +233,76 @@ Answer format:
    Deadline: ...
 """
 
-problem_solution_tech_prompt_template="""
-Analyze the transcript below and extract all
-1. Problem statements mentioned in the discussion. List them clearly and concisely.
-2. Propose Solutions for each problem statement.
-3. Recommended technology stack for each solution.
+combine_prompt_template = """
+You are a helpful assistent that takes notes of meetings.
+The partial reports below were each written from a consecutive part of the same meeting transcript.
+Combine them into one report for the whole meeting: merge overlapping points, remove duplicates and keep the order of the discussion.
+Write every section listed under ===Sections.
+Start each section with its header line exactly as given (for example "=== SUMMARY ===") and do not add any other headers.
 
-===Transcript:
+===Partial reports:
 {text}
 
-===Response Guidelines:
-1. Problem: ...
-   Solution: ...
-   Technology Stack Recommendation: ...
-2. Problem: ...
-   Solution: ...
-   Technology Stack Recommendation: ...
+===Sections:
 """
 
 
-PROBLEM_SOLUTION_TECH_PROMPT = PromptTemplate(template=problem_solution_tech_prompt_template ,input_variables=["text"])
-SUMMARY_PROMPT = PromptTemplate(template=summary_prompt_template, input_variables=["text"])
-KEYPOINT_PROMPT = PromptTemplate(template=keypoints_prompt_template, input_variables=["text"])
-ACTION_ITEM_PROMPT = PromptTemplate(template=action_items_prompt_template, input_variables=["text"])
+# The transcript is sent once per report; each meeting type only asks for the sections it needs.
+general_sections_template = summary_section_template + keypoints_section_template
+technical_sections_template = (
+    general_sections_template + problem_solution_tech_section_template + action_items_section_template
+)
+
+GENERAL_REPORT_PROMPT = PromptTemplate(template=report_prompt_template + general_sections_template, input_variables=["text"])
+TECHNICAL_REPORT_PROMPT = PromptTemplate(template=report_prompt_template + technical_sections_template, input_variables=["text"])
+GENERAL_COMBINE_PROMPT = PromptTemplate(template=combine_prompt_template + general_sections_template, input_variables=["text"])
+TECHNICAL_COMBINE_PROMPT = PromptTemplate(template=combine_prompt_template + technical_sections_template, input_variables=["text"])
+
+GENERAL_REPORT_CHAIN = GENERAL_REPORT_PROMPT | llm | StrOutputParser()
+TECHNICAL_REPORT_CHAIN = TECHNICAL_REPORT_PROMPT | llm | StrOutputParser()
+GENERAL_COMBINE_CHAIN = GENERAL_COMBINE_PROMPT | llm | StrOutputParser()
+TECHNICAL_COMBINE_CHAIN = TECHNICAL_COMBINE_PROMPT | llm | StrOutputParser()
+
+# Transcripts that do not fit in the context next to the longest prompt and the generation
+# budget are reported on chunk by chunk and then combined.  Token counts are estimated
+# at about 4 characters per token.
+CHARS_PER_TOKEN = 4
+prompt_tokens = max(len(prompt.template) for prompt in [TECHNICAL_REPORT_PROMPT, TECHNICAL_COMBINE_PROMPT]) // CHARS_PER_TOKEN
+chunk_tokens = max(256, OLLAMA_NUM_CTX - prompt_tokens - REPORT_OUTPUT_TOKENS)
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=chunk_tokens * CHARS_PER_TOKEN,
+    chunk_overlap=200,
+)
+
+
+# Keyword router for classification
+TECH_TERMS = re.compile(
+    r"\b(api|backend|database|kubernetes|docker|python|deploy|server|latency|cache|model|algorithm|sdk|gpu|cpu|cloud|microservice)\b",
+    re.IGNORECASE,
+)
+TECH_TERM_THRESHOLD = 3
 
+def classify_discussion(text: str) -> str:
+    """
+    Labels a transcript as a technical or non-technical meeting by counting technical terms.
 
-# Load BERT model for classification
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-candidate_labels = [
-    "Technical Meeting",
-    "Non-Technical Meeting"
-]
+    Args:
+        text: The meeting transcript.
+
+    Returns:
+        "Technical Meeting" if the transcript mentions enough technical terms,
+        otherwise "Non-Technical Meeting".
+    """
+    if len(TECH_TERMS.findall(text)) >= TECH_TERM_THRESHOLD:
+        return "Technical Meeting"
+    return "Non-Technical Meeting"
+
+THINK_BLOCK = re.compile(r"<think>.*?</think>", re.DOTALL)
+# Matches a section header on its own line, e.g. "=== SUMMARY ===", "**=== ACTION ITEMS ===**" or "### Key Points".
+REPORT_SECTION_HEADER = re.compile(
+    r"^[ \t#*]*(?:=+[ \t]*)?(SUMMARY|KEY[ _]?POINTS|PROBLEMS|ACTION[ _]?ITEMS)(?:[ \t]*=+)?[ \t#*:]*$",
+    re.MULTILINE | re.IGNORECASE,
+)
 
 def clean_thought_blocks(generated_text: str) -> str:
     """
@@ -160,9 +314,77 @@ def clean_thought_blocks(generated_text: str) -> str:
     Returns:
         The string with all <think> blocks and their content removed.
     """
-    cleaned_text = re.sub(r"<think>.*?</think>", "", generated_text, flags=re.DOTALL).strip()
+    cleaned_text = THINK_BLOCK.sub("", generated_text).strip()
     return cleaned_text
 
+def normalise_section_name(name: str) -> str:
+    """
+    Maps a header name as written by the LLM (e.g. "Key Points", "ACTION ITEMS") to its section key.
+
+    Args:
+        name: The section name matched in the header.
+
+    Returns:
+        One of "SUMMARY", "KEYPOINTS", "PROBLEMS" or "ACTION_ITEMS".
+    """
+    name = re.sub(r"[ _]", "", name.upper())
+    return "ACTION_ITEMS" if name == "ACTIONITEMS" else name
+
+def split_report_sections(generated_text: str) -> dict:
+    """
+    Splits a combined report into its sections using the "=== NAME ===" headers.
+    If the LLM wrote no headers, the whole text is kept as the summary.
+
+    Args:
+        generated_text: The report text returned by the LLM.
+
+    Returns:
+        A dictionary mapping each section name to its content.
+    """
+    parts = REPORT_SECTION_HEADER.split(generated_text)
+    sections = {}
+    for name, content in zip(parts[1::2], parts[2::2]):
+        key = normalise_section_name(name)
+        sections[key] = "\n\n".join(filter(None, [sections.get(key), content.strip()]))
+
+    # Without any headers the whole output is the summary; otherwise text before the
+    # first header is chatter or a title and is dropped.
+    if len(parts) == 1 and parts[0].strip():
+        sections["SUMMARY"] = parts[0].strip()
+    return sections
+
+async def run_report_chain(report_chain, combine_chain, text: str) -> dict:
+    """
+    Runs a report chain over a transcript.  A transcript that does not fit in one chunk
+    is split, a partial report is generated for every chunk, and the partial reports are
+    combined with the combine chain.  While the partial reports are still too long they
+    are split and combined again, so the final call always fits in the context.
+
+    Args:
+        report_chain: The chain that writes a report from a transcript.
+        combine_chain: The chain that writes a report from partial reports.
+        text: The meeting transcript.
+
+    Returns:
+        A dictionary mapping each section name to its content.
+    """
+    chain = report_chain
+    chunks = text_splitter.split_text(text)
+    while len(chunks) > 1:
+        partial_reports = await chain.abatch(
+            [{"text": chunk} for chunk in chunks],
+            config={"max_concurrency": OLLAMA_NUM_PARALLEL},
+        )
+        text = "\n\n".join(clean_thought_blocks(partial_report) for partial_report in partial_reports)
+        chain = combine_chain
+        previous_chunk_count, chunks = len(chunks), text_splitter.split_text(text)
+        # Stop if a round did not shorten the reports, rather than looping forever.
+        if len(chunks) >= previous_chunk_count:
+            break
+
+    report_output = clean_thought_blocks(await chain.ainvoke({"text": text}))
+    return split_report_sections(report_output)
+
 @app.post("/generate_report/")
 async def generate_report(req: TranscriptRequest):
     """
@@ -178,42 +400,28 @@ async def generate_report(req: TranscriptRequest):
     try:
         text = req.transcript
 
-        discussion_type_output = classifier(text, candidate_labels)
-        discussion_type = discussion_type_output['labels'][0]
-
-
-        # Define chains
-        summary_chain = LLMChain(llm=llm, prompt=SUMMARY_PROMPT)
-        keypoint_chain = LLMChain(llm=llm, prompt=KEYPOINT_PROMPT)
-
-        summary_output = clean_thought_blocks(summary_chain.run(text))
-        keypoint_output = clean_thought_blocks(keypoint_chain.run(text))
+        discussion_type = classify_discussion(text)
 
 
         if discussion_type == 'Technical Meeting':
-            problem_solution_tech_chain = LLMChain(llm=llm, prompt=PROBLEM_SOLUTION_TECH_PROMPT)
-            action_item_chain = LLMChain(llm=llm, prompt=ACTION_ITEM_PROMPT)
-
-            problem_solution_tech_output = clean_thought_blocks(problem_solution_tech_chain.run(text))
-            action_item_output = clean_thought_blocks(action_item_chain.run(text))
-
-
-            response = {
-                "discussion_type": discussion_type,
-                "summary": summary_output,
-                "keypoint": keypoint_output,
-                "problem_solution_tech": problem_solution_tech_output,
-                "action_item": action_item_output,
-            }
+            report_chain, combine_chain = TECHNICAL_REPORT_CHAIN, TECHNICAL_COMBINE_CHAIN
+        else:
+            report_chain, combine_chain = GENERAL_REPORT_CHAIN, GENERAL_COMBINE_CHAIN
 
+        report_key = (discussion_type, hashlib.sha256(text.encode()).hexdigest())
+        if report_key in report_cache:
+            sections = report_cache[report_key]
         else:
-            response = {
-                "discussion_type": discussion_type,
-                "summary": summary_output,
-                "keypoint": keypoint_output,
-                "problem_solution_tech": None,
-                "action_item": None,
-            }
+            sections = await run_report_chain(report_chain, combine_chain, text)
+            report_cache[report_key] = sections
+
+        response = {
+            "discussion_type": discussion_type,
+            "summary": sections.get("SUMMARY", ""),
+            "keypoint": sections.get("KEYPOINTS", ""),
+            "problem_solution_tech": sections.get("PROBLEMS"),
+            "action_item": sections.get("ACTION_ITEMS"),
+        }
 
         # print("---------------------------------------------------------------")
         # print('backend report: ')
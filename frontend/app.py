@@ -1,14 +1,40 @@
 import streamlit as st
 import requests
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 import time
+import json
+import hashlib
 from io import BytesIO
+from xml.sax.saxutils import escape
 from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 
 # --- Config ---
 st.set_page_config(layout="wide")
 BACKEND_URL = "http://localhost:8000"
 
+# --- PDF Generation ---
+# Cached on data_key only; the leading underscore stops Streamlit from hashing the report itself on every rerun.
+@st.cache_data(show_spinner=False)
+def generate_pdf(data_key: str, _data_dict: dict) -> bytes:
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = [Paragraph("Smart Minutes Report", styles["Title"])]
+
+    for section, content in _data_dict.items():
+        story.append(Paragraph(section, styles["Heading2"]))
+        for key, value in content.items():
+            if not value:
+                value = "N/A"  # Handle None or empty string
+            story.append(Paragraph(f"<b>{key}:</b>", styles["BodyText"]))
+            story.append(Paragraph(escape(value).replace("\n", "<br/>"), styles["BodyText"]))
+            story.append(Spacer(1, 10))
+
+    doc.build(story)
+    return buffer.getvalue()
+
 # --- Title ---
 st.markdown("<h1 style='text-align: center; color: #4CAF50;'>Meeting Mind</h1>", unsafe_allow_html=True)
 
@@ -40,8 +66,14 @@ if input_type == "Audio/Video File":
                 st.session_state["is_processing"] = True
                 with st.spinner("Transcribing... Please wait."):
                     try:
-                        files = {"file": uploaded_file}
-                        res = requests.post(f"{BACKEND_URL}/upload_audio_video/", files=files)
+                        uploaded_file.seek(0)
+                        form = MultipartEncoder(fields={"file": (uploaded_file.name, uploaded_file, uploaded_file.type)})
+                        res = requests.post(
+                            f"{BACKEND_URL}/upload_audio_video/",
+                            data=form,
+                            headers={"Content-Type": form.content_type},
+                            stream=True,
+                        )
                         res.raise_for_status()
                         st.session_state["transcript"] = res.json()["transcript"]
                     except requests.exceptions.RequestException as e:
@@ -94,83 +126,29 @@ if st.session_state["report_data"]:
         }
     }
 
+    def render_section(title, fields, height):
+        st.markdown(f"### {title}")
+        with st.container(height=height, border=True):
+            for k, v in fields.items():
+                st.markdown(f"**{k}:**\n\n{v}")
+
     left, right = st.columns([3, 4])
 
     with left:
-            st.markdown("### Discussion Type & Summary")
-            st.markdown(
-                "<div style='height: 776px; overflow-y: auto; border: 1px solid #ccc; padding: 18px; border-radius: 10px; background-color: #f7f7f7;color: black; font-weight: bold;'>"
-                + "".join([f"<p><strong>{k}:</strong> {v}</p>" for k, v in responses["Overview"].items()])
-                + "</div>",
-                unsafe_allow_html=True
-            )
+        render_section("Discussion Type & Summary", responses["Overview"], 776)
 
     with right:
-        st.markdown("### Key Points")
-        st.markdown(
-            "<div style='height: 360px; overflow-y: auto; border: 1px solid #ccc; padding: 14px; border-radius: 10px; background-color: #eef6ff; color: black; font-weight: bold;'>"
-            + "".join([f"<p><strong>{k}:</strong> {v}</p>" for k, v in responses["Key Actions"].items()])
-            + "</div>",
-            unsafe_allow_html=True
-        )
-
-        st.markdown("### Problem & Solution")
-        st.markdown(
-            "<div style='height: 360px; overflow-y: auto; border: 1px solid #ccc; padding: 14px; border-radius: 10px; background-color: #fffbe6; color: black; font-weight: bold;'>"
-            + "".join([f"<p><strong>{k}:</strong> {v}</p>" for k, v in responses["Risks & Updates"].items()])
-            + "</div>",
-            unsafe_allow_html=True
-        )
-
-    st.markdown("### Action Items")
-    st.markdown(
-        "<div style='height: 300px; overflow-y: auto; border: 1px solid #ccc; padding: 14px; border-radius: 10px; background-color: #e6ffee; color: black; font-weight: bold;'>"
-        + "".join([f"<p><strong>{k}:</strong> {v}</p>" for k, v in responses["Final Notes"].items()])
-        + "</div>",
-        unsafe_allow_html=True
-    )
+        render_section("Key Points", responses["Key Actions"], 360)
+        render_section("Problem & Solution", responses["Risks & Updates"], 360)
+
+    render_section("Action Items", responses["Final Notes"], 300)
 
-    # --- PDF Generation and Download ---
-    def generate_pdf(data_dict):
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        y = height - 40
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(50, y, "Smart Minutes Report")
-        c.setFont("Helvetica", 12)
-        y -= 30
-
-        for section, content in data_dict.items():
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(50, y, section)
-            y -= 20
-            c.setFont("Helvetica", 12)
-            for key, value in content.items():
-                if not value:
-                    value = "N/A"  # Handle None or empty string
-                lines = value.split("\n")
-                c.drawString(60, y, f"{key}:")
-                y -= 15
-                for line in lines:
-                    for wrapped_line in [line[i:i+90] for i in range(0, len(line), 90)]:
-                        c.drawString(80, y, wrapped_line)
-                        y -= 15
-                        if y < 50:
-                            c.showPage()
-                            y = height - 40
-                y -= 10
-            y -= 10
-
-        c.save()
-        buffer.seek(0)
-        return buffer
-
-
-    pdf_buffer = generate_pdf(responses)
+    # --- PDF Download ---
+    report_key = hashlib.sha256(json.dumps(responses, sort_keys=True).encode()).hexdigest()
+    pdf_bytes = generate_pdf(report_key, responses)
     st.download_button(
         label="📄 Download Report as PDF",
-        data=pdf_buffer,
+        data=pdf_bytes,
         file_name="smart_minutes_report.pdf",
         mime="application/pdf"
     )